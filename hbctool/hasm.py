@@ -43,7 +43,7 @@ def dump(hbc, path, force=False):
     os.makedirs(path)
     # Write all obj to metadata.json
     f = open(f"{path}/metadata.json", "w")
-    json.dump(hbc.getObj(), f)
+    json.dump(hbc.getObj(), f, default=list)
     f.close()
     
     stringCount = hbc.getStringCount()
@@ -150,10 +150,8 @@ def load(path):
         hbc.setString(string["id"], string["value"])
   
     func_asms = read_all_func(hasm_content, hbc)
-    for i in range(len(func_asms)):
-        func = read_func(func_asms, i)
-        hbc.setFunction(i, func)
+    funcs = [(i, read_func(func_asms, i)) for i in range(len(func_asms))]
+    hbc.setFunctions(funcs)
 
-        
     return hbc
 
@@ -0,0 +1,337 @@
+from hbctool.util import *
+from struct import unpack_from
+
+NullTag = 0
+TrueTag = 1 << 4
+FalseTag = 2 << 4
+NumberTag = 3 << 4
+LongStringTag = 4 << 4
+ShortStringTag = 5 << 4
+ByteStringTag = 6 << 4
+IntegerTag = 7 << 4
+TagMask = 0x70
+
+# SLP tag -> (type, element size, struct format code, value of zero-size elements)
+_SLP_DECODERS = {
+    ByteStringTag: ("String", 1, "B", None),
+    ShortStringTag: ("String", 2, "H", None),
+    LongStringTag: ("String", 4, "L", None),
+    NumberTag: ("Number", 8, "d", None),
+    IntegerTag: ("Integer", 4, "L", None),
+    NullTag: ("Null", 0, None, None),
+    TrueTag: ("Boolean", 0, None, True),
+    FalseTag: ("Boolean", 0, None, False)
+}
+
+def _decode_slp_run(buf, iid):
+    # Decode the tag and every element of one SLP run, returning the type,
+    # the values and the offset just past the run
+    keyTag = buf[iid]
+    tag = keyTag & TagMask
+    if keyTag & 0x80:
+        n = ((keyTag & 0x0f) << 8) | buf[iid + 1]
+    else:
+        n = keyTag & 0x0f
+
+    start = iid + (2 if n > 0x0f else 1)
+    if n == 0:
+        return None, [], start
+
+    type, size, fmt, value = _SLP_DECODERS[tag]
+    if fmt is None:
+        # Null and Boolean elements take no bytes
+        return type, [value] * n, start
+
+    return type, list(unpack_from(f"<{n}{fmt}", buf, start)), start + n * size
+
+try:
+    from hbctool.hbc._slp import decode_run as _decode_slp_run
+except ImportError:
+    pass
+
+BUFFER_KEYS = ["stringStorage", "arrayBuffer", "objKeyBuffer", "objValueBuffer", "inst"]
+
+_SMALL_HEADER_KEYS = ("offset", "paramCount", "bytecodeSizeInBytes", "functionName",
+                      "infoOffset", "frameSize", "environmentSize", "highestReadCacheIndex",
+                      "highestWriteCacheIndex", "flags")
+
+class HBCBase:
+    __slots__ = ("obj", "_stringCache", "_instSize", "_instCap")
+
+    # Version specific parser and translator, set by each subclass
+    _parse = None
+    _export = None
+    _disassemble = None
+    _assemble = None
+    INVALID_LENGTH = None
+
+    # SmallFuncHeader stores bytecodeSizeInBytes in 15 bits, larger functions
+    # set the overflowed flag (bit 5) and keep their full header elsewhere
+    _MAX_SMALL_SIZE = (1 << 15) - 1
+    _OVERFLOW_FLAG = 1 << 5
+
+    def __init__(self, f=None):
+        if f:
+            self.setObj(self._parse(f))
+        else:
+            self.obj = None
+            self._stringCache = {}
+            self._instSize = 0
+            self._instCap = 0
+
+    def export(self, f):
+        self._export(self.getObj(), f)
+
+    def getObj(self):
+        # Returns the obj ready for serialization, trimming the capacity reserved
+        # by setFunction. References taken earlier see zero padding at the end
+        # of inst after a growing setFunction until the next getObj or export.
+        # The caller may edit strings through the returned obj, so drop the cache
+        assert self.obj, "Obj is not set."
+        self._commitInst()
+        self._stringCache.clear()
+        return self.obj
+
+    def setObj(self, obj):
+        for key in BUFFER_KEYS:
+            if not isinstance(obj[key], bytearray):
+                obj[key] = bytearray(obj[key])
+
+        self.obj = obj
+        self._stringCache = {}
+        self._instSize = self._instCap = len(obj["inst"])
+
+    def _instEnd(self, inst):
+        # The used length of inst. The padding reserved by setFunction only
+        # counts while inst is still the length it left; once a caller has
+        # resized inst, every byte in it is kept.
+        if len(inst) != self._instCap:
+            self._instSize = self._instCap = len(inst)
+
+        return self._instSize
+
+    def _commitInst(self):
+        # Drop the spare capacity reserved by setFunction
+        inst = self.obj["inst"]
+        del inst[self._instEnd(inst):]
+        self._instCap = len(inst)
+
+    def getVersion(self):
+        raise NotImplementedError
+
+    def getHeader(self):
+        assert self.obj, "Obj is not set."
+        return self.obj["header"]
+
+    def getFunctionCount(self):
+        assert self.obj, "Obj is not set."
+        return self.obj["header"]["functionCount"]
+
+    def getFunction(self, fid, disasm=True, metadata_only=False):
+        obj = self.obj
+        assert obj, "Obj is not set."
+        assert fid >= 0 and fid < obj["header"]["functionCount"], "Invalid function ID"
+
+        functionHeader = obj["functionHeaders"][fid]
+        paramCount = functionHeader["paramCount"]
+        registerCount = functionHeader["frameSize"]
+        symbolCount = functionHeader["environmentSize"]
+        functionName = functionHeader["functionName"]
+
+        functionNameStr, _ = self.getString(functionName)
+        if metadata_only:
+            return functionNameStr, paramCount, registerCount, symbolCount, None, functionHeader
+
+        start = functionHeader["offset"] - obj["instOffset"]
+        bc = obj["inst"][start:start + functionHeader["bytecodeSizeInBytes"]]
+        insts = bc
+        if disasm:
+            insts = self._disassemble(bc)
+
+        return functionNameStr, paramCount, registerCount, symbolCount, insts, functionHeader
+    
+    def setFunction(self, fid, func, disasm=True):
+        self.setFunctions([(fid, func)], disasm=disasm)
+
+    def setFunctions(self, updates, disasm=True):
+        # Apply (fid, func) updates in order, growing the instruction buffer once.
+        # Use self.obj directly, getObj would release the reserved capacity
+        obj = self.obj
+        assert obj, "Obj is not set."
+
+        # Assemble everything first to know the final buffer size
+        inst = obj["inst"]
+        pending = []
+        end = self._instEnd(inst)
+        for fid, func in updates:
+            assert fid >= 0 and fid < obj["header"]["functionCount"], "Invalid function ID"
+
+            functionHeader = obj["functionHeaders"][fid]
+            start = functionHeader["offset"] - obj["instOffset"]
+            insts = func[4]
+            bc = self._assemble(insts) if disasm else insts
+            end = max(end, start + len(bc))
+            pending.append((functionHeader, start, func, bc))
+
+        if end > self._instSize:
+            if end > len(inst):
+                # Extend the instruction buffer, at least doubling its capacity
+                inst.extend(bytes(max(len(inst), end - len(inst))))
+                self._instCap = len(inst)
+
+            self._instSize = end
+
+        for functionHeader, start, func, bc in pending:
+            functionName, paramCount, registerCount, symbolCount, _, _ = func
+
+            functionHeader["paramCount"] = paramCount
+            functionHeader["frameSize"] = registerCount
+            functionHeader["environmentSize"] = symbolCount
+
+            # TODO : Make this work
+            # functionHeader["functionName"] = functionName
+
+            # Handle bytecode size changes
+            original_size = functionHeader["bytecodeSizeInBytes"]
+            new_size = len(bc)
+            self._updateBytecodeSize(functionHeader, new_size, original_size)
+
+            # Copy the bytecode to the instruction buffer
+            memcpy(inst, bc, start, new_size)
+
+    def _applyOverflow(self, functionHeader, new_size, original_size):
+        # Compute the flags and small header backup for a function of new_size bytes.
+        # small is None when the size fits in the 15-bit SmallFuncHeader field.
+        flags = functionHeader.get("flags")
+        if new_size <= self._MAX_SMALL_SIZE:
+            if flags is not None:
+                flags &= ~self._OVERFLOW_FLAG
+            return flags, None
+
+        flags = (flags or 0) | self._OVERFLOW_FLAG
+        small = functionHeader.get("small")
+        if small is None:
+            # Save the current header as small header for future export
+            small = {key: functionHeader[key] for key in _SMALL_HEADER_KEYS if key in functionHeader}
+            # The small header keeps the original size truncated to 15 bits
+            small["bytecodeSizeInBytes"] = min(original_size, self._MAX_SMALL_SIZE)
+            small["flags"] = flags
+
+        return flags, small
+
+    def _updateBytecodeSize(self, functionHeader, new_size, original_size):
+        flags, small = self._applyOverflow(functionHeader, new_size, original_size)
+        if flags is not None:
+            functionHeader["flags"] = flags
+
+        if small is None:
+            functionHeader.pop("small", None)
+        else:
+            functionHeader["small"] = small
+
+        # The full header always carries the real (32-bit) size
+        functionHeader["bytecodeSizeInBytes"] = new_size
+
+    def getStringCount(self):
+        assert self.obj, "Obj is not set."
+        return self.obj["header"]["stringCount"]
+
+    def _stringRange(self, obj, sid):
+        # Resolve a string ID to (isUTF16, offset, length) in stringStorage,
+        # following the overflow table. length counts characters, not bytes.
+        assert sid >= 0 and sid < obj["header"]["stringCount"], "Invalid string ID"
+
+        stringTableEntry = obj["stringTableEntries"][sid]
+        isUTF16 = stringTableEntry["isUTF16"]
+        offset = stringTableEntry["offset"]
+        length = stringTableEntry["length"]
+
+        if length >= self.INVALID_LENGTH:
+            stringTableOverflowEntry = obj["stringTableOverflowEntries"][offset]
+            offset = stringTableOverflowEntry["offset"]
+            length = stringTableOverflowEntry["length"]
+
+        return isUTF16, offset, length
+
+    def getString(self, sid):
+        cached = self._stringCache.get(sid)
+        if cached is not None:
+            return cached
+
+        obj = self.obj
+        assert obj, "Obj is not set."
+        isUTF16, offset, length = self._stringRange(obj, sid)
+
+        if isUTF16:
+            length*=2
+
+        s = obj["stringStorage"][offset:offset + length]
+        string = s.hex() if isUTF16 else s.decode("utf-8"), (isUTF16, offset, length)
+        self._stringCache[sid] = string
+        return string
+
+    def getStringText(self, sid):
+        # Like getString, but UTF-16 strings are decoded to text instead of hex.
+        # Use getString for values that will be passed back to setString.
+        obj = self.obj
+        assert obj, "Obj is not set."
+        isUTF16, offset, length = self._stringRange(obj, sid)
+
+        if isUTF16:
+            length*=2
+
+        s = obj["stringStorage"][offset:offset + length]
+        # surrogatepass keeps lone surrogates, which JavaScript strings may contain
+        text = s.decode("utf-16-le", "surrogatepass") if isUTF16 else s.decode("utf-8")
+        return text, (isUTF16, offset, length)
+    
+    def setString(self, sid, val):
+        obj = self.obj
+        assert obj, "Obj is not set."
+        isUTF16, offset, length = self._stringRange(obj, sid)
+
+        if isUTF16:
+            s = bytes.fromhex(val)
+            l = len(s)//2
+        else:
+            l = len(val)
+            s = val.encode("utf-8")
+        
+        assert l <= length, "Overflowed string length is not supported yet."
+
+        memcpy(obj["stringStorage"], s, offset, len(s))
+        # Strings may share bytes in the storage, so drop every cached entry
+        self._stringCache.clear()
+        
+    def getArrayBufferSize(self):
+        assert self.obj, "Obj is not set."
+        return self.obj["header"]["arrayBufferSize"]
+
+    def getArray(self, aid):
+        obj = self.obj
+        assert obj, "Obj is not set."
+        assert aid >= 0 and aid < obj["header"]["arrayBufferSize"], "Invalid Array ID"
+        t, arr, _ = _decode_slp_run(obj["arrayBuffer"], aid)
+        return t, arr
+
+    def getObjKeyBufferSize(self):
+        assert self.obj, "Obj is not set."
+        return self.obj["header"]["objKeyBufferSize"]
+
+    def getObjKey(self, kid):
+        obj = self.obj
+        assert obj, "Obj is not set."
+        assert kid >= 0 and kid < obj["header"]["objKeyBufferSize"], "Invalid ObjKey ID"
+        t, keys, _ = _decode_slp_run(obj["objKeyBuffer"], kid)
+        return t, keys
+
+    def getObjValueBufferSize(self):
+        assert self.obj, "Obj is not set."
+        return self.obj["header"]["objValueBufferSize"]
+
+    def getObjValue(self, vid):
+        obj = self.obj
+        assert obj, "Obj is not set."
+        assert vid >= 0 and vid < obj["header"]["objValueBufferSize"], "Invalid ObjValue ID"
+        t, keys, _ = _decode_slp_run(obj["objValueBuffer"], vid)
+        return t, keys
@@ -0,0 +1,70 @@
+# cython: language_level=3
+# Optional compiled decoder for the serialized literal (SLP) buffers.
+# Build in place with: cythonize -i hbctool/hbc/_slp.pyx
+
+from libc.string cimport memcpy
+
+cdef enum:
+    NullTag = 0
+    TrueTag = 1 << 4
+    FalseTag = 2 << 4
+    NumberTag = 3 << 4
+    LongStringTag = 4 << 4
+    ShortStringTag = 5 << 4
+    ByteStringTag = 6 << 4
+    IntegerTag = 7 << 4
+    TagMask = 0x70
+
+cdef inline unsigned int _u16(const unsigned char[::1] buf, Py_ssize_t p):
+    return buf[p] | (buf[p + 1] << 8)
+
+cdef inline unsigned int _u32(const unsigned char[::1] buf, Py_ssize_t p):
+    return buf[p] | (buf[p + 1] << 8) | (buf[p + 2] << 16) | (<unsigned int>buf[p + 3] << 24)
+
+cdef inline double _f64(const unsigned char[::1] buf, Py_ssize_t p):
+    cdef unsigned long long bits = _u32(buf, p) | (<unsigned long long>_u32(buf, p + 4) << 32)
+    cdef double val
+    memcpy(&val, &bits, 8)
+    return val
+
+cpdef tuple decode_run(const unsigned char[::1] buf, Py_ssize_t iid):
+    cdef unsigned char keyTag = buf[iid]
+    cdef int tag = keyTag & TagMask
+    # Branchless short/long count: cont is 1 when a second count byte follows,
+    # otherwise buf[iid + cont] rereads the tag byte and is multiplied away
+    cdef Py_ssize_t cont = keyTag >> 7
+    cdef Py_ssize_t n = ((keyTag & 0x0f) << (cont << 3)) | (buf[iid + cont] * cont)
+    cdef Py_ssize_t i, p
+    cdef list vals
+
+    p = iid + 1 + (n > 0x0f)
+    if n == 0:
+        return None, [], p
+
+    vals = []
+    if tag == ByteStringTag:
+        for i in range(n):
+            vals.append(buf[p + i])
+        return "String", vals, p + n
+    elif tag == ShortStringTag:
+        for i in range(n):
+            vals.append(_u16(buf, p + 2 * i))
+        return "String", vals, p + 2 * n
+    elif tag == LongStringTag:
+        for i in range(n):
+            vals.append(_u32(buf, p + 4 * i))
+        return "String", vals, p + 4 * n
+    elif tag == NumberTag:
+        for i in range(n):
+            vals.append(_f64(buf, p + 8 * i))
+        return "Number", vals, p + 8 * n
+    elif tag == IntegerTag:
+        for i in range(n):
+            vals.append(_u32(buf, p + 4 * i))
+        return "Integer", vals, p + 4 * n
+    elif tag == NullTag:
+        return "Null", [None] * n, p
+    elif tag == TrueTag:
+        return "Boolean", [True] * n, p
+    else:
+        return "Boolean", [False] * n, p
@@ -2,6 +2,7 @@ from hbctool.util import *
 import json
 import pathlib
 import copy
+import io
 
 basepath = pathlib.Path(__file__).parent.absolute()
 
@@ -18,14 +19,12 @@ smallFunctionHeaderS = structure["SmallFuncHeader"]
 functionHeaderS = structure["FuncHeader"]
 stringTableEntryS = structure["SmallStringTableEntry"]
 overflowStringTableEntryS = structure["OverflowStringTableEntry"]
-stringStorageS = structure["StringStorage"]
-arrayBufferS = structure["ArrayBuffer"]
-objKeyBufferS = structure["ObjKeyBuffer"]
-objValueBufferS = structure["ObjValueBuffer"]
 regExpTableEntryS = structure["RegExpTableEntry"]
 regExpStorageS = structure["RegExpStorage"]
 cjsModuleTableS = structure["CJSModuleTable"]
 
+smallFunctionHeaderSize = sum(bits * n for _, bits, n in smallFunctionHeaderS.values()) // 8
+
 def align(f):
     f.pad(BYTECODE_ALIGNMENT)
 
@@ -41,13 +40,25 @@ def parse(f):
     align(f)
     
     # Segment 2: Function Header
-    functionHeaders = []
-    for i in range(header["functionCount"]):
+    # Small headers are decoded on first access, except overflowed ones
+    # whose full header has to be read from elsewhere in the file now
+    functionHeaderBuf = bytes(f.readbuf(smallFunctionHeaderSize * header["functionCount"]))
+
+    def loadFunctionHeader(i):
+        start = i * smallFunctionHeaderSize
+        fr = BitReader(io.BytesIO(functionHeaderBuf[start:start + smallFunctionHeaderSize]))
         functionHeader = {}
         for key in smallFunctionHeaderS:
-            functionHeader[key] = read(f, smallFunctionHeaderS[key])
-        
-        if (functionHeader["flags"] >> 5) & 1:
+            functionHeader[key] = read(fr, smallFunctionHeaderS[key])
+
+        return functionHeader
+
+    functionHeaders = LazyList(header["functionCount"], loadFunctionHeader)
+    for i in range(header["functionCount"]):
+        # flags is the last byte of SmallFuncHeader
+        flags = functionHeaderBuf[(i + 1) * smallFunctionHeaderSize - 1]
+        if (flags >> 5) & 1:
+            functionHeader = functionHeaders[i]
             functionHeader["small"] = copy.deepcopy(functionHeader)
             saved_pos = f.tell()
             large_offset = (functionHeader["infoOffset"] << 16 )  | functionHeader["offset"]
@@ -56,8 +67,6 @@ def parse(f):
                 functionHeader[key] = read(f, functionHeaderS[key])
 
             f.seek(saved_pos)
-            
-        functionHeaders.append(functionHeader)
 
     obj["functionHeaders"] = functionHeaders
     align(f)
@@ -105,29 +114,25 @@ def parse(f):
     align(f)
 
     # Segment 6: StringStorage
-    stringStorageS[2] = header["stringStorageSize"]
-    stringStorage = read(f, stringStorageS)
+    stringStorage = f.readbuf(header["stringStorageSize"])
 
     obj["stringStorage"] = stringStorage
     align(f)
 
     # Segment 7: ArrayBuffer
-    arrayBufferS[2] = header["arrayBufferSize"]
-    arrayBuffer = read(f, arrayBufferS)
+    arrayBuffer = f.readbuf(header["arrayBufferSize"])
 
     obj["arrayBuffer"] = arrayBuffer
     align(f)
 
     # Segment 9: ObjKeyBuffer
-    objKeyBufferS[2] = header["objKeyBufferSize"]
-    objKeyBuffer = read(f, objKeyBufferS)
+    objKeyBuffer = f.readbuf(header["objKeyBufferSize"])
 
     obj["objKeyBuffer"] = objKeyBuffer
     align(f)
 
     # Segment 10: ObjValueBuffer
-    objValueBufferS[2] = header["objValueBufferSize"]
-    objValueBuffer = read(f, objValueBufferS)
+    objValueBuffer = f.readbuf(header["objValueBufferSize"])
 
     obj["objValueBuffer"] = objValueBuffer
     align(f)
@@ -164,7 +169,7 @@ def parse(f):
     align(f)
 
     obj["instOffset"] = f.tell()
-    obj["inst"] = f.readall()
+    obj["inst"] = bytearray(f.readall())
 
     return obj
 
@@ -229,29 +234,25 @@ def export(obj, f):
 
     # Segment 6: StringStorage
     stringStorage = obj["stringStorage"]
-    stringStorageS[2] = header["stringStorageSize"]
-    write(f, stringStorage, stringStorageS)
+    f.writeall(stringStorage)
 
     align(f)
 
     # Segment 7: ArrayBuffer
     arrayBuffer = obj["arrayBuffer"]
-    arrayBufferS[2] = header["arrayBufferSize"]
-    write(f, arrayBuffer, arrayBufferS)
+    f.writeall(arrayBuffer)
 
     align(f)
 
     # Segment 9: ObjKeyBuffer
     objKeyBuffer = obj["objKeyBuffer"]
-    objKeyBufferS[2] = header["objKeyBufferSize"]
-    write(f, objKeyBuffer, objKeyBufferS)
+    f.writeall(objKeyBuffer)
 
     align(f)
 
     # Segment 10: ObjValueBuffer
     objValueBuffer = obj["objValueBuffer"]
-    objValueBufferS[2] = header["objValueBufferSize"]
-    write(f, objValueBuffer, objValueBufferS)
+    f.writeall(objValueBuffer)
 
     align(f)
 
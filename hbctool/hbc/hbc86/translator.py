@@ -1,20 +1,26 @@
 import pathlib
 import json
 from hbctool.util import *
+from struct import Struct
 
 basepath = pathlib.Path(__file__).parent.absolute()
 
+def _reader(fmt):
+    # Read one operand in place, without slicing the bytecode
+    unpack_from = Struct(fmt).unpack_from
+    return lambda buf, i: unpack_from(buf, i)[0]
+
 operand_type = {
-    "Reg8": (1, to_uint8, from_uint8),
-    "Reg32": (4, to_uint32, from_uint32),
-    "UInt8": (1, to_uint8, from_uint8),
-    "UInt16": (2, to_uint16, from_uint16),
-    "UInt32": (4, to_uint32, from_uint32),
-    "Addr8": (1, to_int8, from_int8),
-    "Addr32": (4, to_int32, from_int32),
-    "Reg32": (4, to_uint32, from_uint32),
-    "Imm32": (4, to_uint32, from_uint32),
-    "Double": (8, to_double, from_double)
+    "Reg8": (1, _reader("<B"), from_uint8),
+    "Reg32": (4, _reader("<L"), from_uint32),
+    "UInt8": (1, _reader("<B"), from_uint8),
+    "UInt16": (2, _reader("<H"), from_uint16),
+    "UInt32": (4, _reader("<L"), from_uint32),
+    "Addr8": (1, _reader("<b"), from_int8),
+    "Addr32": (4, _reader("<i"), from_int32),
+    "Reg32": (4, _reader("<L"), from_uint32),
+    "Imm32": (4, _reader("<L"), from_uint32),
+    "Double": (8, _reader("<d"), from_double)
 }
 
 f = open(f"{basepath}/data/opcode.json", "r")
@@ -27,6 +33,9 @@ for i, v in enumerate(opcode_mapper):
 f.close()
 
 def disassemble(bc):
+    if isinstance(bc, list):
+        bc = bytes(bc)
+
     i = 0
     insts = []
     while i < len(bc):
@@ -40,7 +49,7 @@ def disassemble(bc):
                 oper_t = oper_t[:-2]
                 
             size, conv_to, _ = operand_type[oper_t]
-            val = conv_to(bc[i:i+size])
+            val = conv_to(bc, i)
             inst[1].append((oper_t, is_str, val))
             i+=size
         
@@ -166,6 +166,41 @@ class BitReader(object):
         self.read += len(a)
         return list(a)
 
+    def readbuf(self, n):
+        assert not self.bcount, "bcount is not zero."
+        a = self.input.read(n)
+        self.read += len(a)
+        return bytearray(a)
+
+class LazyList(object):
+    # Fixed-length sequence whose items are produced by load(i) on first access
+    def __init__(self, n, load):
+        self.items = [None] * n
+        self.load = load
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self.items)))]
+
+        if i < 0:
+            i += len(self.items)
+
+        item = self.items[i]
+        if item is None:
+            item = self.items[i] = self.load(i)
+
+        return item
+
+    def __setitem__(self, i, v):
+        self.items[i] = v
+
+    def __iter__(self):
+        for i in range(len(self.items)):
+            yield self[i]
+
 # File utilization function
 # Read
 def readuint(f, bits=64, signed=False):
@@ -334,6 +369,5 @@ def from_double(val):
 # Buf Function
 
 def memcpy(dest, src, start, length):
-    for i in range(length):
-        dest[start + i] = src[i]
+    dest[start:start + length] = src[:length]
 
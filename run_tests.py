@@ -5,10 +5,14 @@ Usage: poetry run python run_tests.py
 """
 
 import unittest
+import struct
+import copy
+import io
 import sys
 sys.path.insert(0, '.')
 
 from hbctool.hbc.hbc96 import HBC96
+from hbctool.hbc.hbc96 import parser as hbc96_parser
 from hbctool.util import *
 
 class TestHBC96OverflowSuite(unittest.TestCase):
@@ -35,7 +39,7 @@ class TestHBC96OverflowSuite(unittest.TestCase):
 
     def test_normal_function_modification(self):
         """Test normal function modification without overflow"""
-        functionName, paramCount, registerCount, symbolCount, insts, funcHeader = self.hbc.getFunction(0)
+        functionName, paramCount, registerCount, symbolCount, insts, funcHeader = self.hbc.getFunction(0, metadata_only=True)
         
         # Small bytecode
         small_bytecode = [0x01, 0x02, 0x03]
@@ -50,7 +54,7 @@ class TestHBC96OverflowSuite(unittest.TestCase):
 
     def test_15_bit_boundary_exact(self):
         """Test exact 15-bit boundary (32767 bytes) - should NOT overflow"""
-        functionName, paramCount, registerCount, symbolCount, insts, funcHeader = self.hbc.getFunction(0)
+        functionName, paramCount, registerCount, symbolCount, insts, funcHeader = self.hbc.getFunction(0, metadata_only=True)
         
         boundary_bytecode = [0x77] * 32767
         new_func = (functionName, paramCount, registerCount, symbolCount, boundary_bytecode, funcHeader)
@@ -64,7 +68,7 @@ class TestHBC96OverflowSuite(unittest.TestCase):
 
     def test_15_bit_boundary_over(self):
         """Test one byte over 15-bit boundary (32768 bytes) - should overflow"""
-        functionName, paramCount, registerCount, symbolCount, insts, funcHeader = self.hbc.getFunction(0)
+        functionName, paramCount, registerCount, symbolCount, insts, funcHeader = self.hbc.getFunction(0, metadata_only=True)
         
         over_boundary_bytecode = [0x88] * 32768
         new_func = (functionName, paramCount, registerCount, symbolCount, over_boundary_bytecode, funcHeader)
@@ -78,7 +82,7 @@ class TestHBC96OverflowSuite(unittest.TestCase):
 
     def test_large_bytecode_overflow(self):
         """Test large bytecode overflow mechanism"""
-        functionName, paramCount, registerCount, symbolCount, insts, funcHeader = self.hbc.getFunction(0)
+        functionName, paramCount, registerCount, symbolCount, insts, funcHeader = self.hbc.getFunction(0, metadata_only=True)
         
         large_bytecode = [0xFF] * 50000
         new_func = (functionName, paramCount, registerCount, symbolCount, large_bytecode, funcHeader)
@@ -92,7 +96,7 @@ class TestHBC96OverflowSuite(unittest.TestCase):
 
     def test_overflow_flag_clearing(self):
         """Test clearing overflow flag when function size reduces"""
-        functionName, paramCount, registerCount, symbolCount, insts, funcHeader = self.hbc.getFunction(0)
+        functionName, paramCount, registerCount, symbolCount, insts, funcHeader = self.hbc.getFunction(0, metadata_only=True)
         
         # First trigger overflow
         large_bytecode = [0xFF] * 40000
@@ -114,6 +118,240 @@ class TestHBC96OverflowSuite(unittest.TestCase):
         self.assertEqual(header['bytecodeSizeInBytes'], 100)
         print('✅ Overflow flag clearing test passed')
 
+    def test_buffers_are_bytearray(self):
+        """Test list-backed buffers are converted to bytearray on setObj"""
+        obj = self.hbc.getObj()
+        for key in ['stringStorage', 'arrayBuffer', 'objKeyBuffer', 'objValueBuffer', 'inst']:
+            self.assertIsInstance(obj[key], bytearray)
+
+        self.assertEqual(self.hbc.getString(0), ('test', (0, 0, 4)))
+        print('✅ Bytearray buffer test passed')
+
+    def test_string_cache_invalidation(self):
+        """Test setString invalidates the cached getString result"""
+        self.assertEqual(self.hbc.getString(0)[0], 'test')
+        self.hbc.setString(0, 'abcd')
+        self.assertEqual(self.hbc.getString(0)[0], 'abcd')
+        print('✅ String cache invalidation test passed')
+
+    def test_string_cache_obj_edit(self):
+        """Test edits made through getObj are seen by getString"""
+        self.assertEqual(self.hbc.getString(0)[0], 'test')
+        self.hbc.getObj()['stringStorage'][:4] = b'abcd'
+        self.assertEqual(self.hbc.getString(0)[0], 'abcd')
+
+        self.hbc.getObj()['stringTableEntries'][0]['length'] = 2
+        self.assertEqual(self.hbc.getString(0)[0], 'ab')
+        print('✅ String cache obj edit test passed')
+
+    def test_instruction_buffer_growth(self):
+        """Test growing past the buffer end keeps only the committed bytes"""
+        functionName, paramCount, registerCount, symbolCount, insts, funcHeader = self.hbc.getFunction(0, metadata_only=True)
+
+        grown_bytecode = [0x22] * 60000
+        new_func = (functionName, paramCount, registerCount, symbolCount, grown_bytecode, funcHeader)
+        self.hbc.setFunction(0, new_func, disasm=False)
+
+        # Count getters leave the reserved capacity in place
+        self.assertEqual(self.hbc.getFunctionCount(), 1)
+        self.assertEqual(len(self.hbc.obj['inst']), 100000)
+
+        inst = self.hbc.getObj()['inst']
+        self.assertEqual(len(inst), 60000)
+        self.assertEqual(inst, bytearray([0x22] * 60000))
+        print('✅ Instruction buffer growth test passed')
+
+    def test_instruction_buffer_caller_append(self):
+        """Test bytes appended to inst through getObj survive getObj and export"""
+        self.hbc.getObj()['inst'] += bytes([0x99] * 4)
+        self.assertEqual(len(self.hbc.getObj()['inst']), 50004)
+
+        # The reserved padding is kept once the caller has resized inst
+        functionName, paramCount, registerCount, symbolCount, insts, funcHeader = self.hbc.getFunction(0, metadata_only=True)
+        new_func = (functionName, paramCount, registerCount, symbolCount, [0x22] * 60000, funcHeader)
+        self.hbc.setFunction(0, new_func, disasm=False)
+        self.hbc.obj['inst'] += bytes([0x55] * 4)
+        inst = self.hbc.getObj()['inst']
+        self.assertEqual(len(inst), 100012)
+        self.assertEqual(inst[-4:], bytearray([0x55] * 4))
+
+        _, data = self._build_overflow_hbc96()
+        hbc = HBC96(BitReader(io.BytesIO(data)))
+        hbc.getObj()['inst'] += bytes([0x99] * 4)
+        parsed = hbc96_parser.parse(BitReader(io.BytesIO(self._export_hbc96(hbc.getObj()))))
+        self.assertEqual(parsed['inst'][-4:], bytearray([0x99] * 4))
+        print('✅ Instruction buffer caller append test passed')
+
+    def test_get_function_metadata_only(self):
+        """Test metadata_only skips the bytecode but keeps the header fields"""
+        functionName, paramCount, registerCount, symbolCount, insts, funcHeader = self.hbc.getFunction(0, metadata_only=True)
+
+        self.assertEqual((functionName, paramCount, registerCount, symbolCount), ('test', 1, 2, 0))
+        self.assertIsNone(insts)
+        self.assertIs(funcHeader, self.hbc.getObj()['functionHeaders'][0])
+
+        _, _, _, _, bc, _ = self.hbc.getFunction(0, disasm=False)
+        self.assertEqual(bc, bytearray(100))
+        print('✅ Metadata only getFunction test passed')
+
+    def test_get_string_text_utf16(self):
+        """Test getStringText decodes UTF-16 strings while getString keeps hex"""
+        obj = self.hbc.getObj()
+        obj['stringStorage'] += 'hé'.encode('utf-16-le') + b'\x00\xd8'
+        obj['stringTableEntries'].append({'isUTF16': 1, 'offset': 4, 'length': 2})
+        # A lone high surrogate, valid in JavaScript strings
+        obj['stringTableEntries'].append({'isUTF16': 1, 'offset': 8, 'length': 1})
+        obj['header']['stringCount'] = 3
+
+        self.assertEqual(self.hbc.getString(1), ('6800e900', (1, 4, 4)))
+        self.assertEqual(self.hbc.getStringText(1), ('hé', (1, 4, 4)))
+        self.assertEqual(self.hbc.getStringText(0), ('test', (0, 0, 4)))
+        self.assertEqual(self.hbc.getString(2), ('00d8', (1, 8, 2)))
+        self.assertEqual(self.hbc.getStringText(2), ('\ud800', (1, 8, 2)))
+        print('✅ UTF-16 getStringText test passed')
+
+    def test_batched_set_functions(self):
+        """Test setFunctions applies updates in order like repeated setFunction"""
+        functionName, paramCount, registerCount, symbolCount, insts, funcHeader = self.hbc.getFunction(0, metadata_only=True)
+
+        large_func = (functionName, paramCount, registerCount, symbolCount, [0x33] * 60000, funcHeader)
+        small_func = (functionName, paramCount + 1, registerCount, symbolCount, [0x44] * 10, funcHeader)
+        self.hbc.setFunctions([(0, large_func), (0, small_func)], disasm=False)
+
+        header = self.hbc.getObj()['functionHeaders'][0]
+        self.assertEqual(header['bytecodeSizeInBytes'], 10)
+        self.assertEqual(header['paramCount'], paramCount + 1)
+        self.assertEqual(header['flags'] & (1 << 5), 0)
+        self.assertNotIn('small', header)
+
+        inst = self.hbc.getObj()['inst']
+        self.assertEqual(len(inst), 60000)
+        self.assertEqual(inst[:11], bytearray([0x44] * 10 + [0x33]))
+        print('✅ Batched setFunctions test passed')
+
+    def test_function_range_follows_header(self):
+        """Test the bytecode range stays out of the header and follows header edits"""
+        obj = self.hbc.getObj()
+        obj['inst'][:8] = bytearray(range(1, 9))
+        obj['functionHeaders'][0]['bytecodeSizeInBytes'] = 4
+
+        self.assertEqual(self.hbc.getFunction(0, disasm=False)[4], bytearray([1, 2, 3, 4]))
+        self.assertFalse([key for key in obj['functionHeaders'][0] if key.startswith('_')])
+
+        obj['functionHeaders'][0]['offset'] += 2
+        self.assertEqual(self.hbc.getFunction(0, disasm=False)[4], bytearray([3, 4, 5, 6]))
+
+        obj['functionHeaders'][0]['bytecodeSizeInBytes'] = 6
+        self.assertEqual(self.hbc.getFunction(0, disasm=False)[4], bytearray([3, 4, 5, 6, 7, 8]))
+        print('✅ Function range test passed')
+
+    def _export_hbc96(self, obj):
+        """Export obj to HBC96 bytes"""
+        bio = io.BytesIO()
+        writer = BitWriter(bio)
+        hbc96_parser.export(obj, writer)
+        return bio.getvalue()
+
+    def _build_overflow_hbc96(self):
+        """Build a two-function HBC96 file whose second function is overflowed"""
+        header = {key: [0] * n if n > 1 else 0 for key, (_, _, n) in hbc96_parser.headerS.items()}
+        header.update({'magic': hbc96_parser.MAGIC, 'version': 96, 'functionCount': 2,
+                       'stringCount': 1, 'stringStorageSize': 4})
+        small_keys = hbc96_parser.smallFunctionHeaderS.keys()
+        obj = {
+            'header': header,
+            'functionHeaders': [{key: 0 for key in small_keys} for _ in range(2)],
+            'stringKinds': [], 'identifierHashes': [],
+            'stringTableEntries': [{'isUTF16': 0, 'offset': 0, 'length': 4}],
+            'stringTableOverflowEntries': [],
+            'stringStorage': bytearray(b'test'),
+            'arrayBuffer': bytearray(), 'objKeyBuffer': bytearray(), 'objValueBuffer': bytearray(),
+            'regExpTable': [], 'regExpStorage': [], 'cjsModuleTable': [],
+            # 8 bytes of bytecode and room for the large function header
+            'inst': bytearray([1, 2, 3, 4, 5, 6, 7, 8]) + bytearray(32)
+        }
+        # The segments before inst have a fixed size, so a first pass gives instOffset
+        instOffset = hbc96_parser.parse(BitReader(io.BytesIO(self._export_hbc96(obj))))['instOffset']
+        large_offset = instOffset + 8
+
+        obj['functionHeaders'][0].update({'offset': instOffset, 'paramCount': 1, 'bytecodeSizeInBytes': 4})
+        large = {'offset': instOffset + 4, 'paramCount': 2, 'bytecodeSizeInBytes': 4, 'functionName': 0,
+                 'infoOffset': 0, 'frameSize': 3, 'environmentSize': 1, 'highestReadCacheIndex': 0,
+                 'highestWriteCacheIndex': 0, 'flags': 1 << 5}
+        small = dict(large, offset=large_offset & 0xffff, infoOffset=large_offset >> 16, bytecodeSizeInBytes=0)
+        obj['functionHeaders'][1] = dict(large, small=small)
+        return obj, self._export_hbc96(obj)
+
+    def test_lazy_function_headers_overflow(self):
+        """Test lazily parsed headers match the eagerly built ones, overflow included"""
+        expected, data = self._build_overflow_hbc96()
+
+        parsed = hbc96_parser.parse(BitReader(io.BytesIO(data)))
+        functionHeaders = parsed['functionHeaders']
+        self.assertIsInstance(functionHeaders, LazyList)
+        # Overflowed headers are read during parse, the others on first access
+        self.assertIsNone(functionHeaders.items[0])
+        self.assertIsNotNone(functionHeaders.items[1])
+
+        self.assertEqual(functionHeaders[0], expected['functionHeaders'][0])
+        self.assertEqual(functionHeaders[1], expected['functionHeaders'][1])
+        self.assertEqual(functionHeaders[1]['small'], expected['functionHeaders'][1]['small'])
+        self.assertEqual(functionHeaders[-1], functionHeaders[1])
+        self.assertEqual(functionHeaders[:], expected['functionHeaders'])
+        self.assertEqual(functionHeaders[::-1], expected['functionHeaders'][::-1])
+
+        hbc = HBC96(BitReader(io.BytesIO(data)))
+        self.assertEqual(hbc.getFunction(1, disasm=False)[4], bytearray([5, 6, 7, 8]))
+        self.assertEqual(self._export_hbc96(hbc.getObj()), data)
+        print('✅ Lazy function header overflow test passed')
+
+    def _set_slp_buffers(self, runs):
+        """Concatenate SLP runs into every literal buffer, returning their offsets"""
+        buf = bytearray()
+        offsets = []
+        for run in runs:
+            offsets.append(len(buf))
+            buf += run
+
+        obj = self.hbc.getObj()
+        for key in ('arrayBuffer', 'objKeyBuffer', 'objValueBuffer'):
+            obj[key] = bytearray(buf)
+            obj['header'][key + 'Size'] = len(buf)
+        return offsets
+
+    def test_slp_buffer_decoding(self):
+        """Test getArray/getObjKey/getObjValue decode every SLP tag"""
+        shorts = list(range(1000, 1020))
+        runs = [
+            bytes([0x62, 5, 250]),                               # ByteString x2
+            bytes([0xd0, len(shorts)]) + struct.pack('<20H', *shorts),  # ShortString x20, two-byte count
+            bytes([0x41]) + struct.pack('<L', 0x12345678),      # LongString x1
+            bytes([0x32]) + struct.pack('<2d', 1.5, -2.25),     # Number x2
+            bytes([0x71]) + struct.pack('<L', 0xffffffff),      # Integer x1
+            bytes([0x03]),                                       # Null x3
+            bytes([0x12]),                                       # True x2
+            bytes([0x21]),                                       # False x1
+            bytes([0x00]),                                       # Empty run
+        ]
+        expected = [
+            ('String', [5, 250]),
+            ('String', shorts),
+            ('String', [0x12345678]),
+            ('Number', [1.5, -2.25]),
+            ('Integer', [0xffffffff]),
+            ('Null', [None, None, None]),
+            ('Boolean', [True, True]),
+            ('Boolean', [False]),
+            (None, []),
+        ]
+        offsets = self._set_slp_buffers(runs)
+
+        for offset, want in zip(offsets, expected):
+            self.assertEqual(self.hbc.getArray(offset), want)
+            self.assertEqual(self.hbc.getObjKey(offset), want)
+            self.assertEqual(self.hbc.getObjValue(offset), want)
+        print('✅ SLP buffer decoding test passed')
+
 if __name__ == '__main__':
     print('🔧 Running HBC96 Overflow Test Suite...')
     print('=' * 50)